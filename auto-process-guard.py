@@ -6,31 +6,265 @@ import threading
 import signal
 import sys
 import json
+import argparse
+import re
+import socket
+import stat
+import selectors
 import psutil
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import queue
+import random
+import concurrent.futures
+import tempfile
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+import sqlite3
+
+# 事件日志表结构（按目标和时间建索引，便于范围查询）
+JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    target TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    pid INTEGER,
+    exit_code INTEGER,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_target_ts ON events (target, ts);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+"""
+
+def journal_conditions(target=None, since=None, until=None, kind=None):
+    """构造事件日志查询的WHERE子句和参数"""
+    conditions = []
+    params = []
+    if target:
+        conditions.append("target = ?")
+        params.append(target)
+    if since is not None:
+        conditions.append("ts >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("ts < ?")
+        params.append(until)
+    if kind:
+        conditions.append("kind = ?")
+        params.append(kind)
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return where, params
+
+def query_journal(db_path, target=None, since=None, until=None, kind=None, limit=1000):
+    """按目标、时间范围和事件类型查询事件日志
+    
+    超过limit条时返回最新的limit条（按时间正序），并返回是否被截断
+    """
+    where, params = journal_conditions(target, since, until, kind)
+    sql = "SELECT ts, target, kind, pid, exit_code, detail FROM events" + where + " ORDER BY ts DESC LIMIT ?"
+    params.append(int(limit) + 1)
+    
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    truncated = len(rows) > limit
+    rows = rows[:limit]
+    rows.reverse()
+    events = [
+        {"ts": ts, "target": target, "kind": kind, "pid": pid, "exit_code": exit_code, "detail": detail}
+        for ts, target, kind, pid, exit_code, detail in rows
+    ]
+    return events, truncated
+
+def count_launches(db_path, target=None, since=None, until=None):
+    """按启动原因统计整个时间范围内的启动次数（不受查询条数限制）"""
+    where, params = journal_conditions(target, since, until, "launch")
+    sql = "SELECT detail, COUNT(*) FROM events" + where + " GROUP BY detail"
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    return dict(rows)
+
+def lock_file_nonblocking(f):
+    """非阻塞地对文件加排他锁，失败时抛出OSError"""
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+def unlock_file(f):
+    """释放文件锁"""
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class HostSemaphore:
+    """基于锁文件的主机级信号量
+    
+    每个名额对应一个锁文件，进程退出时操作系统自动释放锁。等待者登记
+    带优先级的等待文件，有更高优先级的等待者存活时不抢占名额。
+    """
+    def __init__(self, directory, name, slots, priority):
+        self.directory = directory
+        self.name = name
+        self.slots = slots
+        self.priority = priority
+        self.handle = None          # 持有的名额锁文件
+        self.wait_handle = None     # 等待登记文件
+        self.wait_path = os.path.join(directory, f"{name}.wait.{priority}.{os.getpid()}.{threading.get_ident()}")
+        
+    def higher_priority_waiting(self):
+        """是否有存活的更高优先级等待者，顺带清理已失效的等待文件"""
+        prefix = f"{self.name}.wait."
+        for filename in os.listdir(self.directory):
+            if not filename.startswith(prefix):
+                continue
+            try:
+                priority = int(filename[len(prefix):].split(".")[0])
+            except ValueError:
+                continue
+            if priority <= self.priority:
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                with open(path, "a+b") as f:
+                    lock_file_nonblocking(f)
+                    unlock_file(f)
+                # 能加锁说明登记者已退出
+                os.remove(path)
+            except OSError:
+                return True
+        return False
+        
+    def try_acquire(self):
+        """尝试获取一个名额，成功返回True"""
+        os.makedirs(self.directory, exist_ok=True)
+        if self.wait_handle is None:
+            self.wait_handle = open(self.wait_path, "a+b")
+            lock_file_nonblocking(self.wait_handle)
+        if self.higher_priority_waiting():
+            return False
+            
+        for index in range(self.slots):
+            f = open(os.path.join(self.directory, f"{self.name}.{index}.lock"), "a+b")
+            try:
+                lock_file_nonblocking(f)
+            except OSError:
+                f.close()
+                continue
+            self.handle = f
+            self.cancel()
+            return True
+        return False
+        
+    def cancel(self):
+        """撤销等待登记"""
+        if self.wait_handle is not None:
+            try:
+                unlock_file(self.wait_handle)
+                self.wait_handle.close()
+                os.remove(self.wait_path)
+            except OSError:
+                pass
+            self.wait_handle = None
+            
+    def release(self):
+        """释放名额"""
+        self.cancel()
+        if self.handle is not None:
+            try:
+                unlock_file(self.handle)
+                self.handle.close()
+            except OSError:
+                pass
+            self.handle = None
 
 class OneKeyRecorderGUI:
-    def __init__(self, root):
+    def __init__(self, root, clock=time.time, sleeper=time.sleep):
         self.root = root
         self.root.title("程序监控系统")
         self.root.geometry("900x750")
         self.root.minsize(900, 750)
         
+        # 初始化状态变量
+        self.init_state(clock, sleeper)
+        
+        # 加载配置
+        self.config = self.load_config()
+        self.file_paths = {key: self.config.get(key, "") for key in ("exec_path", "record_dir")}
+        saved_features = self.config.get("features", {})
+        if isinstance(saved_features, dict):
+            self.features.update({key: bool(value) for key, value in saved_features.items() if key in self.features})
+        self.compile_heartbeat_patterns()
+        self.compile_watch_roots()
+        
+        # 创建界面
+        self.create_widgets()
+        
+        # 启动日志更新线程
+        self.log_update_thread = threading.Thread(target=self.update_log_display, daemon=True)
+        self.log_update_thread.start()
+        
+        # 启动事件日志写入线程
+        self.journal_path = self.config.get("journal_file", "")
+        if self.journal_path:
+            self.journal_thread = threading.Thread(target=self.journal_writer_thread, args=(self.journal_path,), daemon=True)
+            self.journal_thread.start()
+        
+        # 启动控制接口
+        self.start_control_server()
+        
+        # 启动配置文件监视线程，SIGHUP也会触发重新加载
+        self.config_mtime = self.get_config_mtime()
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.config_reload_event.set())
+        threading.Thread(target=self.config_watch_thread, daemon=True).start()
+        
+        # 定期检查状态
+        self.root.after(1000, self.update_status)
+        
+    def init_state(self, clock, sleeper):
+        """初始化与界面无关的状态变量，clock/sleeper可替换为虚拟时钟"""
+        # 时钟与休眠函数
+        self.clock = clock
+        self.sleep = sleeper
+        
         # 程序状态变量
         self.process = None
         self.monitoring = False
         self.cleanup_running = False
         self.restart_count = 0
-        self.last_file_update_time = time.time()
-        self.last_check_time = time.time()
+        self.last_file_update_time = self.clock()
+        self.last_check_time = self.clock()
         self.config_file = "monitor_config.json"
         self.log_file = "monitor_log.txt"
         
+        # 控制接口相关变量
+        self.checks_paused = False        # 是否暂停检测
+        self.restart_requested = None     # 请求立即重启的原因
+        self.control_server = None        # 控制接口套接字
+        
+        # 配置热加载相关变量
+        self.config_mtime = None                      # 配置文件修改时间
+        self.config_reload_event = threading.Event()  # 信号触发的重新加载请求
+        self.file_paths = {}                          # 配置文件中最近一次加载/保存的路径
+        
         # 两次检测机制相关变量
         self.first_check_time = None  # 第一次检测时间
         self.second_check_time = None  # 第二次检测时间
+        self.check_jitter = 0          # 本轮检测的随机错峰（秒）
+        self.rng = random.Random()
         
         # 功能开关
         self.features = {
@@ -38,12 +272,33 @@ class OneKeyRecorderGUI:
             "file_activity": True,        # 文件活动监控
             "auto_cleanup": True,         # 自动清理
             "first_check": True,          # 第一次检测
-            "second_check": True          # 第二次检测
+            "second_check": True,         # 第二次检测
+            "output_heartbeat": False     # 输出心跳
         }
         
+        # 输出心跳相关变量
+        self.heartbeat_patterns = []      # 预编译的心跳正则
+        self.last_output_heartbeat = 0    # 最后一次有效心跳时间
+        self.last_output_speed = None     # 最近解析到的速度
+        
+        # 多目录扫描相关变量
+        self.watch_roots = []             # 预编译的监控目录 (路径, 小写后缀元组, 超时)
+        self.cleanup_suffixes = (".ts",)  # 预编译的清理扩展名
+        self.root_devices = {}            # 目录所在设备（用于分片）
+        self.device_futures = {}          # 正在解析设备的任务
+        self.scan_workers = {}            # 每个设备一个扫描线程的任务队列
+        self.scan_futures = {}            # 每个目录尚未取回结果的扫描任务
+        self.cleanup_futures = {}         # 每个目录最近一次清理任务
+        self.scan_results = {}            # 每个目录最近一次完成的扫描结果 (修改时间, 路径)
+        self.scan_lock = threading.Lock()
+        self.scan_timeouts = set()        # 当前扫描超时的目录
+        
         # 队列用于线程间通信
         self.log_queue = queue.Queue()
         self.status_queue = queue.Queue()
+        self.journal_queue = queue.Queue()
+        self.journal_path = ""
+        self.journal_thread = None
         
         # 默认配置
         self.default_config = {
@@ -53,22 +308,23 @@ class OneKeyRecorderGUI:
             "first_check_delay": 10,    # 第一次检测延迟（秒）
             "second_check_delay": 20,   # 第二次检测延迟（秒）
             "check_interval": 30,
-            "file_extensions": [".ts", ".mp4", ".flv", ".mkv", ".avi"]
+            "file_extensions": [".ts", ".mp4", ".flv", ".mkv", ".avi"],
+            "heartbeat_patterns": [r"speed=\s*([\d.]+)x"],  # 输出心跳正则（第1个分组为速度）
+            "min_speed": 0.5,           # 速度低于该值视为卡顿
+            "control_socket": "monitor_control.sock",  # 控制接口套接字路径（为空则不启动）
+            "journal_file": "monitor_journal.db",      # 事件日志数据库（为空则不记录）
+            "target_name": "",          # 事件日志中的目标名称（为空则使用可执行文件名）
+            "watch_roots": [],          # 多个监控目录 [{"path", "extensions", "timeout"}]，为空则使用record_dir
+            "cleanup_extensions": [".ts"],  # 自动清理的文件扩展名
+            "scan_timeout": 5,          # 单个目录扫描超时（秒）
+            "priority": 0,              # 重要程度，越大越优先获得启动/扫描名额
+            "max_concurrent_spawns": 2, # 主机上同时启动的程序数（0为不限制）
+            "max_concurrent_scans": 2,  # 主机上同时进行的清理扫描数（0为不限制）
+            "admission_timeout": 60,    # 等待名额的最长时间（秒），超时后直接执行
+            "admission_dir": "",        # 锁文件目录（为空则使用系统临时目录）
+            "first_check_jitter": 3     # 检测时间的随机错峰上限（秒）
         }
         
-        # 加载配置
-        self.config = self.load_config()
-        
-        # 创建界面
-        self.create_widgets()
-        
-        # 启动日志更新线程
-        self.log_update_thread = threading.Thread(target=self.update_log_display, daemon=True)
-        self.log_update_thread.start()
-        
-        # 定期检查状态
-        self.root.after(1000, self.update_status)
-        
     def create_widgets(self):
         """创建GUI界面"""
         # 创建主框架
@@ -125,19 +381,23 @@ class OneKeyRecorderGUI:
         feature_frame.grid(row=4, column=0, columnspan=4, sticky=(tk.W, tk.E), pady=(0, 10))
         
         self.feature_status_vars = {}
+        self.feature_status_labels = {}
         feature_names = [
             ("进程监控", "process_monitor"),
             ("文件监控", "file_activity"),
             ("自动清理", "auto_cleanup"),
             ("首次检测", "first_check"),
-            ("二次检测", "second_check")
+            ("二次检测", "second_check"),
+            ("输出心跳", "output_heartbeat")
         ]
         
         for i, (display_name, key) in enumerate(feature_names):
             var = tk.StringVar(value="启用" if self.features[key] else "禁用")
             self.feature_status_vars[key] = var
             ttk.Label(feature_frame, text=f"{display_name}:").grid(row=0, column=i*2, padx=(0, 5))
-            ttk.Label(feature_frame, textvariable=var, foreground="green" if self.features[key] else "red").grid(row=0, column=i*2+1, padx=(0, 15))
+            label = ttk.Label(feature_frame, textvariable=var, foreground="green" if self.features[key] else "red")
+            label.grid(row=0, column=i*2+1, padx=(0, 15))
+            self.feature_status_labels[key] = label
         
         # 第五行：状态显示
         status_frame = ttk.LabelFrame(main_frame, text="运行状态", padding="5")
@@ -211,13 +471,16 @@ class OneKeyRecorderGUI:
             messagebox.showerror("错误", "请选择有效的可执行文件!")
             return
             
-        if not record_dir or not os.path.exists(record_dir) or not os.path.isdir(record_dir):
+        # 仅在需要扫描目录且未配置多目录时验证监控目录
+        need_dir = self.features["file_activity"] or self.features["auto_cleanup"]
+        if need_dir and not self.config.get("watch_roots") and (not record_dir or not os.path.exists(record_dir) or not os.path.isdir(record_dir)):
             messagebox.showerror("错误", "请选择有效的监控目录!")
             return
             
         # 更新配置
         self.config["exec_path"] = exec_path
         self.config["record_dir"] = record_dir
+        self.compile_watch_roots()
         
         # 重置检测状态
         self.reset_check_status()
@@ -230,8 +493,12 @@ class OneKeyRecorderGUI:
         
         # 重置状态
         self.restart_count = 0
-        self.last_file_update_time = time.time()
-        self.last_check_time = time.time()
+        self.last_file_update_time = self.clock()
+        self.last_check_time = self.clock()
+        self.last_output_heartbeat = 0
+        self.last_output_speed = None
+        self.checks_paused = False
+        self.restart_requested = None
         self.monitoring = True
         self.cleanup_running = True
         
@@ -241,7 +508,8 @@ class OneKeyRecorderGUI:
         
         self.log_message("开始监控任务...")
         self.log_message(f"监控程序: {exec_path}")
-        self.log_message(f"监控目录: {record_dir}")
+        for path, suffixes, timeout in self.watch_roots:
+            self.log_message(f"监控目录: {path} ({', '.join(suffixes)})")
         
         # 显示启用的功能
         enabled_features = [name for name, enabled in self.features.items() if enabled]
@@ -276,6 +544,7 @@ class OneKeyRecorderGUI:
                     self.process.kill()
                 except:
                     pass
+            self.record_event("exit", pid=self.process.pid, exit_code=self.process.poll(), detail="stopped")
             self.process = None
             
         # 更新界面状态
@@ -286,19 +555,16 @@ class OneKeyRecorderGUI:
         
     def monitoring_thread(self):
         """监控主逻辑线程"""
-        exec_path = self.config["exec_path"]
-        record_dir = self.config["record_dir"]
-        
         try:
-            # 启动清理线程（如果启用）
+            # 启动清理线程（是否清理由功能开关实时控制）
+            cleanup_thread = threading.Thread(target=self.cleanup_thread, daemon=True)
+            cleanup_thread.start()
             if self.features["auto_cleanup"]:
-                cleanup_thread = threading.Thread(target=self.cleanup_thread, args=(record_dir,), daemon=True)
-                cleanup_thread.start()
                 self.log_message("自动清理线程已启动")
             
             # 启动可执行文件（如果启用进程监控）
             if self.features["process_monitor"]:
-                if not self.start_exec_file(exec_path):
+                if not self.start_exec_file(self.config["exec_path"], "initial"):
                     self.monitoring = False
                     return
             else:
@@ -307,29 +573,62 @@ class OneKeyRecorderGUI:
             # 主监控循环
             while self.monitoring:
                 try:
-                    # 检查并重启可执行文件（如果启用进程监控）
-                    if self.features["process_monitor"]:
-                        self.restart_exec_if_needed(exec_path)
-                    
-                    # 检查文件活动和执行检测机制（如果启用文件监控）
-                    if self.features["file_activity"]:
-                        self.check_file_activity_and_process(record_dir)
-                    else:
-                        # 如果文件监控禁用，但仍需要更新状态显示
-                        self.update_status_display()
-                    
+                    self.monitor_tick()
                 except Exception as e:
                     self.log_message(f"监控线程异常: {e}")
-                time.sleep(1)
+                    self.record_event("error", detail=f"监控线程异常: {e}")
+                self.sleep(1)
                 
         except Exception as e:
             self.log_message(f"监控线程异常: {e}")
+            self.record_event("error", detail=f"监控线程异常: {e}")
         finally:
             self.monitoring = False
             
-    def start_exec_file(self, exec_path):
-        """启动可执行文件"""
+    def monitor_tick(self):
+        """执行一轮监控检查（主循环每秒调用一次）"""
+        # 每轮读取最新配置，支持热加载
+        config = self.config
+        
+        # 处理控制接口或配置变更的重启请求
+        if self.restart_requested:
+            (reason, message), self.restart_requested = self.restart_requested, None
+            self.log_message(f"{message}，正在重启进程...")
+            self.restart_process(self.clock(), reason)
+            
+        # 检查并重启可执行文件（如果启用进程监控，暂停检测时仍恢复崩溃的进程）
+        if self.features["process_monitor"]:
+            self.restart_exec_if_needed(config["exec_path"])
+            
+        # 检测已暂停时只更新状态显示
+        if self.checks_paused:
+            self.update_status_display()
+            return
+        
+        # 根据程序输出更新心跳（如果启用输出心跳）
+        if self.features["output_heartbeat"]:
+            self.check_output_heartbeat()
+        
+        # 检查文件活动和执行检测机制（如果启用文件监控）
+        if self.features["file_activity"]:
+            self.check_file_activity_and_process()
+        elif self.features["output_heartbeat"]:
+            # 仅依靠输出心跳时跳过目录扫描
+            self.update_status_display()
+            self.execute_check_mechanism(int(self.clock() - self.last_file_update_time))
+        else:
+            # 如果文件监控禁用，但仍需要更新状态显示
+            self.update_status_display()
+            
+    def start_exec_file(self, exec_path, reason):
+        """启动可执行文件，reason记录启动原因"""
+        # 申请主机级启动名额，避免多个监控器同时清理进程和启动
+        slot = self.acquire_host_slot("spawn", self.config.get("max_concurrent_spawns", 2))
         try:
+            # 等待名额期间监控已停止，不再启动
+            if not self.monitoring:
+                return False
+                
             # 杀死可能存在的相同进程
             self.kill_existing_processes(exec_path)
             
@@ -357,9 +656,32 @@ class OneKeyRecorderGUI:
                     stderr=subprocess.PIPE
                 )
                 
+            # 启动过程中监控已停止，终止刚启动的进程
+            if not self.monitoring:
+                process, self.process = self.process, None
+                try:
+                    process.terminate()
+                    process.wait(timeout=3)
+                except:
+                    try:
+                        process.kill()
+                        process.wait(timeout=3)
+                    except:
+                        pass
+                # 没有读取线程接管输出管道，直接关闭
+                process.stdout.close()
+                process.stderr.close()
+                return False
+                
+            # 启动输出读取线程
+            for stream in (self.process.stdout, self.process.stderr):
+                reader = threading.Thread(target=self.output_reader_thread, args=(self.process, stream), daemon=True)
+                reader.start()
+                
             self.restart_count += 1
             self.log_message(f"监控程序已启动，PID: {self.process.pid} (第{self.restart_count}次启动)")
             self.status_queue.put(f"运行中 (PID: {self.process.pid})")
+            self.record_event("launch", pid=self.process.pid, detail=reason)
             
             # 重置检测时间
             self.reset_check_status()
@@ -368,7 +690,38 @@ class OneKeyRecorderGUI:
         except Exception as e:
             self.log_message(f"启动失败: {e}")
             self.status_queue.put("启动失败")
+            self.record_event("error", detail=f"启动失败: {e}")
             return False
+        finally:
+            if slot:
+                slot.release()
+                
+    def acquire_host_slot(self, name, slots):
+        """申请主机级并发名额，返回持有的信号量；未启用、等待超时或监控停止时返回None"""
+        if slots <= 0:
+            return None
+        directory = self.config.get("admission_dir") or os.path.join(tempfile.gettempdir(), "auto-process-guard")
+        semaphore = HostSemaphore(directory, name, slots, self.config.get("priority", 0))
+        deadline = self.clock() + self.config.get("admission_timeout", 60)
+        waiting = False
+        try:
+            while not semaphore.try_acquire():
+                if not self.monitoring:
+                    semaphore.cancel()
+                    return None
+                if self.clock() >= deadline:
+                    self.log_message(f"等待主机{name}名额超时，直接执行")
+                    semaphore.cancel()
+                    return None
+                if not waiting:
+                    waiting = True
+                    self.log_message(f"主机{name}名额已满，排队等待...")
+                self.sleep(0.2 + self.rng.uniform(0, 0.3))
+        except OSError as e:
+            self.log_message(f"主机名额申请失败: {e}")
+            semaphore.cancel()
+            return None
+        return semaphore
             
     def kill_existing_processes(self, exec_path):
         """杀死可能存在的相同进程"""
@@ -411,33 +764,166 @@ class OneKeyRecorderGUI:
             if self.process:
                 exit_code = self.process.poll()
                 self.log_message(f"监控程序已退出，退出码: {exit_code}")
+                self.record_event("exit", pid=self.process.pid, exit_code=exit_code, detail="exited")
                 
             self.log_message("检测到监控程序关闭，正在重新启动...")
             self.status_queue.put("重启中...")
-            time.sleep(2)
-            return self.start_exec_file(exec_path)
+            self.sleep(2)
+            return self.start_exec_file(exec_path, "exited")
         return True
         
-    def check_file_activity_and_process(self, record_dir):
+    def compile_watch_roots(self):
+        """预编译监控目录列表，扩展名转为小写后缀元组"""
+        default_extensions = self.config.get("file_extensions", [".ts", ".mp4", ".flv", ".mkv", ".avi"])
+        default_timeout = self.config.get("scan_timeout", 5)
+        roots = self.config.get("watch_roots") or [{"path": self.config.get("record_dir", "")}]
+        
+        watch_roots = []
+        for entry in roots:
+            path = entry.get("path", "")
+            if not path:
+                continue
+            suffixes = tuple(ext.lower() for ext in entry.get("extensions", default_extensions))
+            watch_roots.append((path, suffixes, entry.get("timeout", default_timeout)))
+        self.watch_roots = watch_roots
+        self.cleanup_suffixes = tuple(ext.lower() for ext in self.config.get("cleanup_extensions", [".ts"]))
+        
+    def resolve_device_thread(self, future, path):
+        """解析目录所在设备（在独立线程中执行，挂起的挂载点不会阻塞调用方）"""
+        try:
+            future.set_result(os.stat(path).st_dev)
+        except Exception as e:
+            future.set_exception(e)
+            
+    def get_root_device(self, path, timeout):
+        """获取目录的分片键：所在设备号；stat未及时完成或失败时使用路径本身"""
+        device = self.root_devices.get(path)
+        if device is not None:
+            return device
+        with self.scan_lock:
+            future = self.device_futures.get(path)
+            created = future is None
+            if created:
+                future = self.device_futures[path] = concurrent.futures.Future()
+                threading.Thread(target=self.resolve_device_thread, args=(future, path), daemon=True).start()
+        # 只在首次解析时短暂等待，之后仍未完成则直接按路径分片，挂起的目录不会每轮都拖慢调用方
+        try:
+            device = future.result(timeout=min(timeout, 1) if created else 0)
+        except concurrent.futures.TimeoutError:
+            return path
+        except Exception:
+            # 目录暂不可用，下次重新解析
+            self.device_futures.pop(path, None)
+            return path
+        self.root_devices[path] = device
+        return device
+        
+    def submit_root_task(self, futures, path, timeout, func, *args):
+        """把目录任务交给所在设备的扫描线程，返回Future并记入futures；该目录上次任务未结束时返回None"""
+        with self.scan_lock:
+            previous = futures.get(path)
+            if previous is not None and not previous.done():
+                return None
+        device = self.get_root_device(path, timeout)
+        with self.scan_lock:
+            task_queue = self.scan_workers.get(device)
+            if task_queue is None:
+                task_queue = self.scan_workers[device] = queue.Queue()
+                threading.Thread(target=self.scan_worker_thread, args=(task_queue,), daemon=True).start()
+            future = concurrent.futures.Future()
+            task_queue.put((future, func, args))
+            futures[path] = future
+        return future
+        
+    def scan_worker_thread(self, task_queue):
+        """扫描线程，每个设备一个，慢盘不会拖慢其他磁盘"""
+        while True:
+            future, func, args = task_queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+                
+    def iter_files(self, path, suffixes):
+        """遍历目录中匹配后缀的文件，生成(路径, 修改时间)"""
+        for root, dirs, files in os.walk(path):
+            for file in files:
+                if file.lower().endswith(suffixes):
+                    filepath = os.path.join(root, file)
+                    try:
+                        yield filepath, os.path.getmtime(filepath)
+                    except OSError:
+                        continue
+                        
+    def remove_file(self, filepath):
+        """删除文件"""
+        os.remove(filepath)
+                
+    def scan_root(self, path, suffixes):
+        """扫描单个监控目录，返回(修改时间, 路径)"""
+        latest_mtime = 0
+        latest_file = None
+        for filepath, mtime in self.iter_files(path, suffixes):
+            if mtime > latest_mtime:
+                latest_mtime = mtime
+                latest_file = filepath
+        return latest_mtime, latest_file
+        
+    def collect_scan_result(self, path, future, wait):
+        """等待目录扫描结果最多wait秒，完成后记入scan_results"""
+        try:
+            self.scan_results[path] = future.result(timeout=wait)
+        except concurrent.futures.TimeoutError:
+            if path not in self.scan_timeouts:
+                self.scan_timeouts.add(path)
+                self.log_message(f"目录扫描超时，沿用上次结果: {path}")
+            return
+        except Exception as e:
+            self.log_message(f"目录扫描失败: {path} - {e}")
+        else:
+            if path in self.scan_timeouts:
+                self.scan_timeouts.discard(path)
+                self.log_message(f"目录扫描已恢复: {path}")
+        self.scan_futures.pop(path, None)
+        
+    def find_latest_file(self):
+        """按设备分片并行扫描所有监控目录，返回(修改时间, 路径)
+        
+        未在超时内完成的目录沿用其最近一次完成的结果，迟到的结果在下一轮取回
+        """
+        deadlines = {}
+        for path, suffixes, timeout in self.watch_roots:
+            # 先取回上一轮超时后才完成的结果
+            future = self.scan_futures.get(path)
+            if future is not None and future.done():
+                self.collect_scan_result(path, future, 0)
+            # 上次扫描仍未结束（如NFS挂起）时不重复提交
+            if self.submit_root_task(self.scan_futures, path, timeout, self.scan_root, path, suffixes) is not None:
+                deadlines[path] = time.monotonic() + timeout
+                
+        latest_mtime = 0
+        latest_file = None
+        for path, suffixes, timeout in self.watch_roots:
+            future = self.scan_futures.get(path)
+            if future is not None:
+                # 本轮提交的任务等到目录超时为止，之前遗留的任务只取已完成的结果
+                deadline = deadlines.get(path)
+                self.collect_scan_result(path, future, max(0, deadline - time.monotonic()) if deadline else 0)
+            mtime, filepath = self.scan_results.get(path, (0, None))
+            if mtime > latest_mtime:
+                latest_mtime = mtime
+                latest_file = filepath
+        return latest_mtime, latest_file
+        
+    def check_file_activity_and_process(self):
         """检查文件活动并执行检测机制"""
         try:
-            current_time = time.time()
-            latest_mtime = 0
-            latest_file = None
-            file_extensions = self.config.get("file_extensions", [".ts", ".mp4", ".flv", ".mkv", ".avi"])
+            current_time = self.clock()
             
             # 查找最新文件
-            for root, dirs, files in os.walk(record_dir):
-                for file in files:
-                    if any(file.lower().endswith(ext.lower()) for ext in file_extensions):
-                        filepath = os.path.join(root, file)
-                        try:
-                            mtime = os.path.getmtime(filepath)
-                            if mtime > latest_mtime:
-                                latest_mtime = mtime
-                                latest_file = filepath
-                        except:
-                            continue
+            latest_mtime, latest_file = self.find_latest_file()
             
             # 更新最后文件更新时间
             if latest_mtime > self.last_file_update_time and latest_mtime > 0:
@@ -457,18 +943,83 @@ class OneKeyRecorderGUI:
         except Exception as e:
             self.log_message(f"文件活动检查异常: {e}")
             
+    def output_reader_thread(self, process, stream):
+        """读取程序输出并增量解析心跳"""
+        buffer = b""
+        try:
+            # ffmpeg等程序用\r刷新进度行，因此按\r和\n同时切分
+            for chunk in iter(lambda: stream.read1(4096), b""):
+                if not self.features["output_heartbeat"]:
+                    buffer = b""
+                    continue
+                lines = re.split(rb"[\r\n]", buffer + chunk)
+                buffer = lines.pop()
+                if len(buffer) > 4096:
+                    buffer = b""
+                for line in lines:
+                    if line and process is self.process:
+                        self.parse_output_line(line.decode("utf-8", errors="replace"))
+        except Exception:
+            pass
+        finally:
+            try:
+                stream.close()
+            except:
+                pass
+                
+    def parse_output_line(self, line):
+        """解析一行输出，匹配心跳正则并提取速度"""
+        for pattern in self.heartbeat_patterns:
+            match = pattern.search(line)
+            if not match:
+                continue
+            speed = None
+            if match.groups():
+                try:
+                    speed = float(match.group(1))
+                except (TypeError, ValueError):
+                    speed = None
+            self.last_output_speed = speed
+            # 速度低于阈值时不计为心跳，按卡顿处理
+            if speed is None or speed >= self.config.get("min_speed", 0.5):
+                self.last_output_heartbeat = self.clock()
+            return
+            
+    def check_output_heartbeat(self):
+        """用输出心跳更新最后活动时间"""
+        if self.last_output_heartbeat > self.last_file_update_time:
+            self.last_file_update_time = self.last_output_heartbeat
+            
+            # 有心跳时重置检测时间
+            if self.first_check_time is not None:
+                self.log_message("检测到程序输出心跳，重置检测状态")
+            self.reset_check_status()
+            
+    def compile_heartbeat_patterns(self):
+        """预编译输出心跳正则"""
+        patterns = []
+        for expr in self.config.get("heartbeat_patterns", []):
+            try:
+                patterns.append(re.compile(expr))
+            except re.error as e:
+                self.log_message(f"心跳正则无效: {expr} - {e}")
+        self.heartbeat_patterns = patterns
+            
     def update_status_display(self):
         """更新状态显示"""
-        current_time = time.time()
+        current_time = self.clock()
         idle_time = int(current_time - self.last_file_update_time)
-        self.idle_time_var.set(f"空闲时间: {idle_time}秒")
+        if self.features["output_heartbeat"] and self.last_output_speed is not None:
+            self.idle_time_var.set(f"空闲时间: {idle_time}秒 (速度: {self.last_output_speed}x)")
+        else:
+            self.idle_time_var.set(f"空闲时间: {idle_time}秒")
         self.last_update_var.set(f"最后更新: {datetime.fromtimestamp(self.last_file_update_time).strftime('%H:%M:%S')}")
         self.restart_count_var.set(f"重启次数: {self.restart_count}")
             
     def execute_check_mechanism(self, idle_time):
         """执行检测机制 - 根据功能开关"""
         try:
-            current_time = time.time()
+            current_time = self.clock()
             
             # 如果两个检测都禁用，直接返回
             if not self.features["first_check"] and not self.features["second_check"]:
@@ -478,8 +1029,9 @@ class OneKeyRecorderGUI:
             if self.second_check_time is not None:
                 return
             
-            first_delay = max(1, self.config.get("first_check_delay", 10))
-            second_delay = max(first_delay + 5, self.config.get("second_check_delay", 20))
+            # 检测时间叠加随机错峰，避免多个监控器同时触发
+            first_delay = max(1, self.config.get("first_check_delay", 10)) + self.check_jitter
+            second_delay = max(first_delay + 5, self.config.get("second_check_delay", 20) + self.check_jitter)
             
             # 第一次检测（如果启用）
             if (self.features["first_check"] and 
@@ -488,6 +1040,7 @@ class OneKeyRecorderGUI:
                 self.first_check_time = current_time
                 self.check_status_var.set(f"检测状态: 第1次检测({first_delay}s)")
                 self.log_message(f"第1次检测: 空闲{first_delay}秒，检查进程状态")
+                self.record_event("first_check", detail=f"idle {idle_time}s")
                 
                 # 检查进程状态（如果启用进程监控）
                 if self.features["process_monitor"]:
@@ -495,7 +1048,7 @@ class OneKeyRecorderGUI:
                         self.log_message("进程正常运行，等待第二次检测")
                     else:
                         self.log_message("检测到进程关闭，立即重启")
-                        self.restart_process(current_time)
+                        self.restart_process(current_time, "first_check")
                         return
                 else:
                     self.log_message("进程监控已禁用，跳过进程检查")
@@ -508,13 +1061,15 @@ class OneKeyRecorderGUI:
                 self.second_check_time = current_time
                 self.check_status_var.set(f"检测状态: 第2次检测({second_delay}s)")
                 self.log_message(f"第2次检测: 空闲{second_delay}秒，强制重启进程")
-                self.restart_process(current_time)
+                self.record_event("second_check", detail=f"idle {idle_time}s")
+                self.restart_process(current_time, "second_check")
                 
         except Exception as e:
             self.log_message(f"检测机制异常: {e}")
+            self.record_event("error", detail=f"检测机制异常: {e}")
 
-    def restart_process(self, current_time):
-        """重启进程的统一方法"""
+    def restart_process(self, current_time, reason):
+        """重启进程的统一方法，reason记录重启原因"""
         try:
             # 如果启用进程监控才终止进程
             if self.features["process_monitor"] and self.process:
@@ -526,6 +1081,7 @@ class OneKeyRecorderGUI:
                         self.process.kill()
                     except:
                         pass
+                self.record_event("exit", pid=self.process.pid, exit_code=self.process.poll(), detail=reason)
                 self.process = None
                 self.log_message("原进程已终止")
             
@@ -534,63 +1090,95 @@ class OneKeyRecorderGUI:
             self.reset_check_status()
             self.check_status_var.set("检测状态: 重启中")
             
-            time.sleep(2)
+            self.sleep(2)
             
             # 如果启用进程监控才重启
             if self.features["process_monitor"]:
-                self.start_exec_file(self.config["exec_path"])
+                self.start_exec_file(self.config["exec_path"], reason)
             
         except Exception as e:
             self.log_message(f"重启进程失败: {e}")
+            self.record_event("error", detail=f"重启进程失败: {e}")
 
+    def get_check_phase(self):
+        """获取当前检测阶段"""
+        if self.second_check_time is not None:
+            return "second_check"
+        if self.first_check_time is not None:
+            return "first_check"
+        return "waiting"
+        
     def reset_check_status(self):
         """重置检测状态"""
         self.first_check_time = None
         self.second_check_time = None
+        self.check_jitter = self.rng.randint(0, max(0, int(self.config.get("first_check_jitter", 3))))
         self.check_status_var.set("检测状态: 重置")
         
-    def cleanup_thread(self, directory):
+    def cleanup_thread(self):
         """清理线程"""
         try:
             hours = self.config.get("cleanup_hours", 20)
-            self.log_message(f"开始自动清理任务... (清理{hours}小时前的文件)")
+            if self.features["auto_cleanup"]:
+                self.log_message(f"开始自动清理任务... (清理{hours}小时前的文件)")
             
             while self.cleanup_running:
-                self.cleanup_files(directory, hours)
-                time.sleep(10)  # 每10秒检查一次
+                # 每轮读取最新配置，支持热加载
+                if self.features["auto_cleanup"]:
+                    self.cleanup_tick()
+                self.sleep(10)  # 每10秒检查一次
                 
         except Exception as e:
             self.log_message(f"清理线程异常: {e}")
             
-    def cleanup_files(self, directory, hours):
-        """清理过期文件"""
+    def cleanup_tick(self):
+        """执行一轮清理：每个目录交给所在设备的扫描线程，按目录超时等待"""
+        cutoff = self.clock() - self.config.get("cleanup_hours", 20) * 3600
+        for path, suffixes, timeout in self.watch_roots:
+            # 每个目录单独申请主机级扫描名额，清理超时后即释放，挂起的目录不会长期占用名额
+            slot = self.acquire_host_slot("scan", self.config.get("max_concurrent_scans", 2))
+            try:
+                if not self.cleanup_running:
+                    return
+                future = self.submit_root_task(self.cleanup_futures, path, timeout, self.cleanup_files, path, self.cleanup_suffixes, cutoff)
+                if future is None:
+                    # 该目录上次清理尚未结束
+                    continue
+                try:
+                    future.result(timeout=timeout)
+                except concurrent.futures.TimeoutError:
+                    self.log_message(f"目录清理超时，本轮跳过: {path}")
+            finally:
+                if slot:
+                    slot.release()
+                
+    def cleanup_files(self, directory, suffixes, cutoff):
+        """清理目录中修改时间早于cutoff的过期文件"""
         try:
-            cutoff = time.time() - (hours * 3600)
             count = 0
             
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    if file.lower().endswith('.ts'):
-                        filepath = os.path.join(root, file)
-                        try:
-                            if os.path.getmtime(filepath) < cutoff:
-                                os.remove(filepath)
-                                count += 1
-                                self.log_message(f"清理: {filepath}")
-                        except Exception as e:
-                            self.log_message(f"清理失败: {filepath} - {e}")
+            for filepath, mtime in self.iter_files(directory, suffixes):
+                if mtime < cutoff:
+                    try:
+                        self.remove_file(filepath)
+                        count += 1
+                        self.log_message(f"清理: {filepath}")
+                    except Exception as e:
+                        self.log_message(f"清理失败: {filepath} - {e}")
             
             if count > 0:
                 self.log_message(f"本轮清理 {count} 个文件")
+                self.record_event("cleanup", detail=f"{count} files")
                 
         except Exception as e:
             self.log_message(f"清理出错: {e}")
+            self.record_event("error", detail=f"清理出错: {e}")
             
     def open_config_dialog(self):
         """打开配置对话框"""
         config_window = tk.Toplevel(self.root)
         config_window.title("配置参数")
-        config_window.geometry("450x400")
+        config_window.geometry("450x480")
         config_window.resizable(False, False)
         
         # 居中显示
@@ -626,19 +1214,30 @@ class OneKeyRecorderGUI:
         extensions_var = tk.StringVar(value=",".join(self.config.get("file_extensions", [".ts", ".mp4", ".flv", ".mkv", ".avi"])))
         ttk.Entry(main_frame, textvariable=extensions_var, width=30).grid(row=4, column=1, sticky=tk.W, pady=5, padx=(10, 0))
         
+        # 输出心跳正则
+        ttk.Label(main_frame, text="输出心跳正则:").grid(row=5, column=0, sticky=tk.W, pady=5)
+        heartbeat_var = tk.StringVar(value=";".join(self.config.get("heartbeat_patterns", [])))
+        ttk.Entry(main_frame, textvariable=heartbeat_var, width=30).grid(row=5, column=1, sticky=tk.W, pady=5, padx=(10, 0))
+        
+        # 最低速度
+        ttk.Label(main_frame, text="最低输出速度(x):").grid(row=6, column=0, sticky=tk.W, pady=5)
+        min_speed_var = tk.StringVar(value=str(self.config.get("min_speed", 0.5)))
+        ttk.Entry(main_frame, textvariable=min_speed_var, width=10).grid(row=6, column=1, sticky=tk.W, pady=5, padx=(10, 0))
+        
         # 说明文本
         info_text = tk.Text(main_frame, height=6, width=50, wrap=tk.WORD)
-        info_text.grid(row=5, column=0, columnspan=2, pady=10)
+        info_text.grid(row=7, column=0, columnspan=2, pady=10)
         info_text.insert(tk.END, "配置说明：\n"
                         "1. 支持多种可执行文件：.exe, .bat, .cmd, .sh等\n"
                         "2. 检测机制可通过功能开关控制\n"
                         "3. 第二次检测时间应大于第一次检测时间\n"
-                        "4. 文件监控扩展名可自定义")
+                        "4. 文件监控扩展名可自定义\n"
+                        "5. 心跳正则用分号分隔，第1个分组为速度")
         info_text.config(state=tk.DISABLED)
         
         # 按钮
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=6, column=0, columnspan=2, pady=10)
+        button_frame.grid(row=8, column=0, columnspan=2, pady=10)
         
         def save_config():
             try:
@@ -658,6 +1257,17 @@ class OneKeyRecorderGUI:
                 extensions = [ext.strip() for ext in extensions_var.get().split(",")]
                 extensions = [ext if ext.startswith('.') else '.' + ext for ext in extensions]
                 self.config["file_extensions"] = extensions
+                patterns = [expr.strip() for expr in heartbeat_var.get().split(";") if expr.strip()]
+                for expr in patterns:
+                    try:
+                        re.compile(expr)
+                    except re.error:
+                        messagebox.showerror("错误", f"心跳正则无效: {expr}")
+                        return
+                self.config["heartbeat_patterns"] = patterns
+                self.config["min_speed"] = float(min_speed_var.get())
+                self.compile_heartbeat_patterns()
+                self.compile_watch_roots()
                 self.log_message("配置参数已更新")
                 config_window.destroy()
             except ValueError:
@@ -673,7 +1283,7 @@ class OneKeyRecorderGUI:
         """打开功能开关对话框"""
         feature_window = tk.Toplevel(self.root)
         feature_window.title("功能开关")
-        feature_window.geometry("300x250")
+        feature_window.geometry("300x290")
         feature_window.resizable(False, False)
         
         # 居中显示
@@ -691,7 +1301,8 @@ class OneKeyRecorderGUI:
             ("文件监控", "file_activity", "监控目录文件活动"),
             ("自动清理", "auto_cleanup", "自动清理过期文件"),
             ("首次检测", "first_check", "第一次空闲检测"),
-            ("二次检测", "second_check", "第二次强制检测")
+            ("二次检测", "second_check", "第二次强制检测"),
+            ("输出心跳", "output_heartbeat", "根据程序输出判断活动")
         ]
         
         # 创建复选框
@@ -712,13 +1323,7 @@ class OneKeyRecorderGUI:
                 self.features[key] = var.get()
             
             # 更新界面显示
-            for key, var in self.feature_status_vars.items():
-                status = "启用" if self.features[key] else "禁用"
-                var.set(status)
-                # 更新颜色
-                for widget in feature_frame.winfo_children():
-                    if isinstance(widget, ttk.Label) and widget.cget("textvariable") == str(var):
-                        widget.configure(foreground="green" if self.features[key] else "red")
+            self.refresh_feature_status()
             
             self.log_message("功能开关已更新")
             feature_window.destroy()
@@ -734,10 +1339,17 @@ class OneKeyRecorderGUI:
                               font=("Arial", 9), foreground="red")
         info_label.grid(row=len(feature_info)+1, column=0, columnspan=2, pady=(10, 0))
         
+    def refresh_feature_status(self):
+        """刷新功能状态显示"""
+        for key, var in self.feature_status_vars.items():
+            var.set("启用" if self.features[key] else "禁用")
+            self.feature_status_labels[key].configure(foreground="green" if self.features[key] else "red")
+        
     def save_current_config(self):
         """保存当前配置"""
         self.config["exec_path"] = self.exec_path_var.get()
         self.config["record_dir"] = self.record_dir_var.get()
+        self.config["features"] = dict(self.features)
         self.save_config(self.config)
         self.log_message("配置已保存")
         
@@ -746,6 +1358,9 @@ class OneKeyRecorderGUI:
         try:
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(config_data, f, ensure_ascii=False, indent=2)
+            # 自身保存的配置不再触发热加载
+            self.config_mtime = self.get_config_mtime()
+            self.file_paths = {key: config_data.get(key, "") for key in ("exec_path", "record_dir")}
         except Exception as e:
             self.log_message(f"保存配置失败: {e}")
             
@@ -763,6 +1378,462 @@ class OneKeyRecorderGUI:
             self.log_message(f"加载配置失败: {e}")
         return self.default_config.copy()
         
+    def validate_config(self, config):
+        """校验配置，返回合并默认值后的新配置，无效时抛出ValueError"""
+        if not isinstance(config, dict):
+            raise ValueError("配置文件格式错误")
+        merged_config = self.default_config.copy()
+        merged_config.update(config)
+        
+        for key in ("cleanup_hours", "first_check_delay", "second_check_delay", "check_interval"):
+            value = merged_config[key]
+            if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+                raise ValueError(f"{key} 必须为正整数")
+        for key in ("priority", "max_concurrent_spawns", "max_concurrent_scans", "admission_timeout", "first_check_jitter"):
+            value = merged_config[key]
+            if isinstance(value, bool) or not isinstance(value, int) or (key != "priority" and value < 0):
+                raise ValueError(f"{key} 必须为整数")
+        if merged_config["second_check_delay"] <= merged_config["first_check_delay"]:
+            raise ValueError("第二次检测时间应大于第一次检测时间")
+        if isinstance(merged_config["min_speed"], bool) or not isinstance(merged_config["min_speed"], (int, float)):
+            raise ValueError("min_speed 必须为数字")
+            
+        extensions = merged_config["file_extensions"]
+        if not isinstance(extensions, list) or not all(isinstance(ext, str) and ext.strip() for ext in extensions):
+            raise ValueError("file_extensions 必须为扩展名列表")
+        merged_config["file_extensions"] = [ext.strip() if ext.strip().startswith('.') else '.' + ext.strip() for ext in extensions]
+        
+        patterns = merged_config["heartbeat_patterns"]
+        if not isinstance(patterns, list):
+            raise ValueError("heartbeat_patterns 必须为正则列表")
+        for expr in patterns:
+            try:
+                re.compile(expr)
+            except (re.error, TypeError) as e:
+                raise ValueError(f"心跳正则无效: {expr} - {e}")
+                
+        roots = merged_config["watch_roots"]
+        if not isinstance(roots, list):
+            raise ValueError("watch_roots 必须为目录列表")
+        for entry in roots:
+            if not isinstance(entry, dict) or not isinstance(entry.get("path"), str) or not entry["path"]:
+                raise ValueError("watch_roots 中每项必须包含 path")
+            root_extensions = entry.get("extensions", merged_config["file_extensions"])
+            if not isinstance(root_extensions, list) or not all(isinstance(ext, str) and ext.strip() for ext in root_extensions):
+                raise ValueError(f"扩展名列表无效: {entry['path']}")
+            entry["extensions"] = [ext.strip() if ext.strip().startswith('.') else '.' + ext.strip() for ext in root_extensions]
+            timeout = entry.get("timeout", merged_config["scan_timeout"])
+            if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0:
+                raise ValueError(f"扫描超时无效: {entry['path']}")
+        cleanup_extensions = merged_config["cleanup_extensions"]
+        if not isinstance(cleanup_extensions, list) or not all(isinstance(ext, str) and ext.strip() for ext in cleanup_extensions):
+            raise ValueError("cleanup_extensions 必须为扩展名列表")
+        merged_config["cleanup_extensions"] = [ext.strip() if ext.strip().startswith('.') else '.' + ext.strip() for ext in cleanup_extensions]
+        if isinstance(merged_config["scan_timeout"], bool) or not isinstance(merged_config["scan_timeout"], (int, float)) or merged_config["scan_timeout"] <= 0:
+            raise ValueError("scan_timeout 必须为正数")
+            
+        features = merged_config.get("features", {})
+        if not isinstance(features, dict):
+            raise ValueError("features 必须为对象")
+        for key, value in features.items():
+            if key not in self.features or not isinstance(value, bool):
+                raise ValueError(f"功能开关无效: {key}")
+                
+        return merged_config
+        
+    def reload_config(self):
+        """重新加载配置文件，校验通过后整体替换并就地生效"""
+        self.config_mtime = self.get_config_mtime()
+        with open(self.config_file, 'r', encoding='utf-8') as f:
+            config = self.validate_config(json.load(f))
+            
+        # 界面中启动时填写的路径可能未保存到文件：
+        # 文件中的路径为空或与上次加载的值相同时，沿用当前运行中的路径
+        file_paths = {key: config[key] for key in ("exec_path", "record_dir")}
+        for key, file_value in file_paths.items():
+            if not file_value or file_value == self.file_paths.get(key):
+                config[key] = self.config.get(key, "")
+                
+        # 监控运行中不接受无效的可执行文件路径
+        if self.monitoring and not os.path.exists(config["exec_path"]):
+            raise ValueError(f"可执行文件不存在: {config['exec_path']}")
+            
+        old_exec_path = self.config.get("exec_path")
+        
+        # 整体替换配置引用，监控线程与清理线程下一轮即读取新值
+        self.config = config
+        self.file_paths = file_paths
+        self.features.update(config.get("features", {}))
+        self.compile_heartbeat_patterns()
+        self.compile_watch_roots()
+        self.root.after(0, self.refresh_config_display)
+        self.log_message("配置文件已重新加载")
+        
+        # 只有可执行文件路径变化时才重启被监控程序
+        if self.monitoring and config["exec_path"] != old_exec_path:
+            self.restart_requested = ("exec_path_changed", "可执行文件路径已变更")
+            
+    def refresh_config_display(self):
+        """刷新界面上的配置显示"""
+        self.exec_path_var.set(self.config.get("exec_path", ""))
+        self.record_dir_var.set(self.config.get("record_dir", ""))
+        self.refresh_feature_status()
+        
+    def get_config_mtime(self):
+        """获取配置文件修改时间，文件不存在时返回None"""
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
+            
+    def config_watch_thread(self):
+        """配置文件监视线程"""
+        while True:
+            signaled = self.config_reload_event.wait(timeout=2)
+            self.config_reload_event.clear()
+            mtime = self.get_config_mtime()
+            if not signaled and (mtime is None or mtime == self.config_mtime):
+                continue
+            try:
+                self.reload_config()
+            except Exception as e:
+                self.config_mtime = mtime
+                self.log_message(f"重新加载配置失败: {e}")
+        
+    def start_control_server(self):
+        """启动本地控制接口（Unix套接字 + JSON）"""
+        path = self.config.get("control_socket", "")
+        if not path:
+            return
+        if not hasattr(socket, "AF_UNIX"):
+            self.log_message("当前系统不支持Unix套接字，控制接口未启动")
+            return
+            
+        self.control_commands = {
+            "status": self.control_status,
+            "restart": self.control_restart,
+            "pause": self.control_pause,
+            "resume": self.control_resume,
+            "feature": self.control_feature,
+            "reload": self.control_reload,
+            "events": self.control_events
+        }
+        
+        try:
+            # 仅清理上次残留的套接字文件，不抢占其他监控器正在使用的套接字
+            if os.path.exists(path):
+                if not stat.S_ISSOCK(os.stat(path).st_mode):
+                    self.log_message(f"控制接口路径不是套接字文件，控制接口未启动: {path}")
+                    return
+                probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                probe.settimeout(1)
+                try:
+                    probe.connect(path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    os.unlink(path)
+                except OSError:
+                    self.log_message(f"控制接口已被其他监控器占用，控制接口未启动: {path}")
+                    return
+                else:
+                    self.log_message(f"控制接口已被其他监控器占用，控制接口未启动: {path}")
+                    return
+                finally:
+                    probe.close()
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(path)
+            server.listen(8)
+            server.setblocking(False)
+        except Exception as e:
+            self.log_message(f"控制接口启动失败: {e}")
+            return
+            
+        self.control_server = server
+        self.control_socket_path = path
+        threading.Thread(target=self.control_server_thread, args=(server,), daemon=True).start()
+        self.log_message(f"控制接口已启动: {path}")
+        
+    def stop_control_server(self):
+        """关闭控制接口"""
+        server = self.control_server
+        if server is None:
+            return
+        self.control_server = None
+        try:
+            os.unlink(self.control_socket_path)
+        except:
+            pass
+            
+    def control_server_thread(self, server):
+        """控制接口服务线程，非阻塞处理所有连接；耗时命令交给工作线程，完成后回送结果"""
+        selector = selectors.DefaultSelector()
+        selector.register(server, selectors.EVENT_READ)
+        wake_recv, wake_send = socket.socketpair()
+        wake_recv.setblocking(False)
+        selector.register(wake_recv, selectors.EVENT_READ)
+        tasks = queue.Queue()
+        done = queue.Queue()
+        connections = {}
+        threading.Thread(target=self.control_worker_thread, args=(tasks, done, wake_send), daemon=True).start()
+        
+        def close_conn(conn):
+            state = connections.pop(conn, None)
+            if state and state["mask"]:
+                selector.unregister(conn)
+            conn.close()
+            
+        def serve(conn, state):
+            # 依次处理完整的请求行；耗时请求完成前暂缓后续请求，保证响应顺序
+            while not state["busy"] and b"\n" in state["in"]:
+                line, state["in"] = state["in"].split(b"\n", 1)
+                if not line.strip():
+                    continue
+                if self.is_slow_control_request(line):
+                    state["busy"] = True
+                    tasks.put((conn, line))
+                else:
+                    state["out"] += self.handle_control_request(line)
+                    
+            if state["out"]:
+                try:
+                    sent = conn.send(state["out"])
+                    state["out"] = state["out"][sent:]
+                except BlockingIOError:
+                    pass
+                    
+            if state["eof"] and not state["out"] and not state["busy"]:
+                close_conn(conn)
+                return
+            mask = 0 if state["eof"] else selectors.EVENT_READ
+            if state["out"]:
+                mask |= selectors.EVENT_WRITE
+            if mask != state["mask"]:
+                # 等待工作线程且无数据可写时暂不监听该连接
+                if not state["mask"]:
+                    selector.register(conn, mask, state)
+                elif not mask:
+                    selector.unregister(conn)
+                else:
+                    selector.modify(conn, mask, state)
+                state["mask"] = mask
+                
+        try:
+            while self.control_server is server:
+                for key, events in selector.select(timeout=0.5):
+                    if key.fileobj is server:
+                        try:
+                            conn, _ = server.accept()
+                        except BlockingIOError:
+                            continue
+                        conn.setblocking(False)
+                        state = {"in": b"", "out": b"", "eof": False, "busy": False, "mask": selectors.EVENT_READ}
+                        connections[conn] = state
+                        selector.register(conn, selectors.EVENT_READ, state)
+                        continue
+                        
+                    if key.fileobj is wake_recv:
+                        # 取回工作线程完成的响应
+                        try:
+                            wake_recv.recv(4096)
+                        except BlockingIOError:
+                            pass
+                        while True:
+                            try:
+                                conn, response = done.get_nowait()
+                            except queue.Empty:
+                                break
+                            state = connections.get(conn)
+                            if state is None:
+                                continue
+                            state["out"] += response
+                            state["busy"] = False
+                            try:
+                                serve(conn, state)
+                            except Exception:
+                                close_conn(conn)
+                        continue
+                        
+                    conn, state = key.fileobj, key.data
+                    try:
+                        if events & selectors.EVENT_READ:
+                            data = conn.recv(65536)
+                            if data:
+                                state["in"] += data
+                            else:
+                                # 客户端关闭写端，未以换行结尾的请求也一并处理
+                                state["eof"] = True
+                                state["in"] += b"\n"
+                            if len(state["in"]) > 65536:
+                                raise ValueError("请求过长")
+                        serve(conn, state)
+                    except BlockingIOError:
+                        pass
+                    except Exception:
+                        close_conn(conn)
+        except Exception as e:
+            self.log_message(f"控制接口异常: {e}")
+        finally:
+            tasks.put(None)
+            for conn in list(connections):
+                conn.close()
+            server.close()
+            wake_recv.close()
+            wake_send.close()
+            selector.close()
+            
+    def control_worker_thread(self, tasks, done, wake_send):
+        """控制接口工作线程，执行查询事件日志、重新加载配置等耗时命令"""
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            conn, line = task
+            done.put((conn, self.handle_control_request(line)))
+            try:
+                wake_send.send(b"\0")
+            except OSError:
+                return
+                
+    def is_slow_control_request(self, line):
+        """是否为需交给工作线程执行的耗时命令"""
+        try:
+            return json.loads(line).get("cmd") in ("events", "reload")
+        except Exception:
+            return False
+            
+    def handle_control_request(self, line):
+        """处理一条JSON控制请求，返回JSON响应行"""
+        try:
+            request = json.loads(line)
+            handler = self.control_commands.get(request.get("cmd"))
+            if handler is None:
+                response = {"ok": False, "error": f"未知命令: {request.get('cmd')}"}
+            else:
+                response = {"ok": True}
+                response.update(handler(request))
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+        return (json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8")
+        
+    def control_status(self, request):
+        """控制命令: 查询状态"""
+        process = self.process
+        return {
+            "monitoring": self.monitoring,
+            "paused": self.checks_paused,
+            "restart_count": self.restart_count,
+            "pid": process.pid if process and process.poll() is None else None,
+            "idle_time": round(self.clock() - self.last_file_update_time, 3),
+            "check_phase": self.get_check_phase(),
+            "features": dict(self.features)
+        }
+        
+    def control_restart(self, request):
+        """控制命令: 立即重启（由监控线程执行）"""
+        if not self.monitoring:
+            raise ValueError("监控未运行")
+        self.restart_requested = ("control", "收到控制接口重启请求")
+        return {}
+        
+    def control_pause(self, request):
+        """控制命令: 暂停检测"""
+        self.checks_paused = True
+        self.log_message("控制接口: 已暂停检测")
+        return {"paused": True}
+        
+    def control_resume(self, request):
+        """控制命令: 恢复检测"""
+        # 恢复时重置空闲计时，避免暂停期间的空闲时间立即触发重启
+        self.last_file_update_time = self.clock()
+        self.reset_check_status()
+        self.checks_paused = False
+        self.log_message("控制接口: 已恢复检测")
+        return {"paused": False}
+        
+    def control_feature(self, request):
+        """控制命令: 切换功能开关，未指定enabled时取反"""
+        name = request.get("name")
+        if name not in self.features:
+            raise ValueError(f"未知功能: {name}")
+        enabled = request.get("enabled", not self.features[name])
+        if not isinstance(enabled, bool):
+            raise ValueError(f"enabled 必须为布尔值: {enabled!r}")
+        self.features[name] = enabled
+        self.root.after(0, self.refresh_feature_status)
+        self.log_message(f"控制接口: 功能 {name} 已{'启用' if self.features[name] else '禁用'}")
+        return {"features": dict(self.features)}
+        
+    def control_reload(self, request):
+        """控制命令: 重新加载配置"""
+        self.reload_config()
+        return {}
+        
+    def control_events(self, request):
+        """控制命令: 按目标和时间范围查询事件日志"""
+        if not self.journal_path:
+            raise ValueError("事件日志未启用")
+        events, truncated = query_journal(
+            self.journal_path,
+            target=request.get("target"),
+            since=request.get("since"),
+            until=request.get("until"),
+            kind=request.get("kind"),
+            limit=min(int(request.get("limit", 1000)), 10000)
+        )
+        return {"events": events, "truncated": truncated}
+        
+    def get_target_name(self):
+        """获取事件日志中的目标名称"""
+        return self.config.get("target_name") or os.path.basename(self.config.get("exec_path", ""))
+        
+    def record_event(self, kind, pid=None, exit_code=None, detail=""):
+        """记录事件到日志队列，由写入线程落盘"""
+        if self.journal_path:
+            self.journal_queue.put((self.clock(), self.get_target_name(), kind, pid, exit_code, detail))
+            
+    def journal_writer_thread(self, db_path):
+        """事件日志写入线程（SQLite WAL模式，批量提交）"""
+        try:
+            conn = sqlite3.connect(db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(JOURNAL_SCHEMA)
+        except Exception as e:
+            self.log_message(f"事件日志打开失败: {e}")
+            self.journal_path = ""
+            return
+            
+        running = True
+        while running:
+            batch = [self.journal_queue.get()]
+            # 合并已排队的事件，一次提交
+            while len(batch) < 256:
+                try:
+                    batch.append(self.journal_queue.get_nowait())
+                except queue.Empty:
+                    break
+            # None为退出标记，写完已排队的事件后结束
+            if None in batch:
+                running = False
+                batch = [event for event in batch if event is not None]
+            if not batch:
+                continue
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO events (ts, target, kind, pid, exit_code, detail) VALUES (?, ?, ?, ?, ?, ?)",
+                        batch
+                    )
+            except Exception as e:
+                self.log_message(f"事件日志写入失败: {e}")
+        conn.close()
+        
+    def close_journal(self):
+        """写完已排队的事件并关闭事件日志"""
+        if self.journal_thread is not None:
+            self.journal_queue.put(None)
+            self.journal_thread.join(timeout=5)
+            self.journal_thread = None
+        
     def log_message(self, message):
         """添加日志消息到队列"""
         timestamp = datetime.now().strftime('%H:%M:%S')
@@ -804,7 +1875,293 @@ class OneKeyRecorderGUI:
         # 继续定期更新
         self.root.after(1000, self.update_status)
 
+class VirtualClock:
+    """虚拟时钟，sleep只推进时间不真正等待"""
+    def __init__(self, start=0.0):
+        self.now = start
+        
+    def time(self):
+        return self.now
+        
+    def sleep(self, seconds):
+        self.now += seconds
+
+class PlainVar:
+    """无界面时代替tk.StringVar"""
+    def __init__(self, value=""):
+        self.value = value
+        
+    def set(self, value):
+        self.value = value
+        
+    def get(self):
+        return self.value
+
+class SimulatedProcess:
+    """模拟的被监控进程"""
+    def __init__(self, pid):
+        self.pid = pid
+        self.returncode = None
+        self.stalled = False    # 卡住：进程存活但不再写文件
+        
+    def poll(self):
+        return self.returncode
+        
+    def wait(self, timeout=None):
+        return self.returncode
+        
+    def terminate(self):
+        if self.returncode is None:
+            self.returncode = -15
+            
+    def kill(self):
+        if self.returncode is None:
+            self.returncode = -9
+
+class SimulatedGuard(OneKeyRecorderGUI):
+    """无界面的监控器，在虚拟时钟下运行真实的检测、重启与清理逻辑"""
+    def __init__(self, config, clock, rng):
+        self.init_state(clock.time, clock.sleep)
+        self.rng = rng
+        self.config = self.default_config.copy()
+        self.config.update(config)
+        self.features["auto_cleanup"] = False
+        for name in ("status_var", "check_status_var", "idle_time_var", "last_update_var", "restart_count_var"):
+            setattr(self, name, PlainVar())
+        self.latest_write = 0       # 模拟的最新文件修改时间
+        self.launches = []          # (启动时间, 原因)
+        self.files = {}             # 模拟的文件集合 {路径: 虚拟修改时间}
+        self.removed = []           # (删除时间, 路径, 虚拟修改时间)
+        self.compile_watch_roots()
+        
+    def submit_root_task(self, futures, path, timeout, func, *args):
+        # 模拟文件集合无需设备分片，直接同步执行
+        future = futures[path] = concurrent.futures.Future()
+        future.set_result(func(*args))
+        return future
+        
+    def iter_files(self, path, suffixes):
+        for filepath, mtime in list(self.files.items()):
+            if filepath.startswith(path) and filepath.lower().endswith(suffixes):
+                yield filepath, mtime
+                
+    def remove_file(self, filepath):
+        self.removed.append((self.clock(), filepath, self.files.pop(filepath)))
+        
+    def start_exec_file(self, exec_path, reason):
+        self.process = SimulatedProcess(len(self.launches) + 1)
+        self.restart_count += 1
+        self.launches.append((self.clock(), reason))
+        self.reset_check_status()
+        return True
+        
+    def find_latest_file(self):
+        return self.latest_write, "simulated.ts"
+        
+    def log_message(self, message):
+        pass
+
+def run_scenario(config, duration, write_interval, write_jitter, faults, rng):
+    """在虚拟时钟下运行一个脚本化场景
+    
+    faults为[(时间, "stall"或"crash"), ...]，返回(检测延迟列表, 误重启次数, 未检测故障数)
+    """
+    clock = VirtualClock()
+    guard = SimulatedGuard(config, clock, rng)
+    guard.monitoring = True
+    guard.start_exec_file(guard.config["exec_path"], "initial")
+    
+    pending = sorted(faults)
+    fault_start = None
+    next_write = write_interval
+    launch_count = len(guard.launches)
+    latencies = []
+    false_restarts = 0
+    
+    while clock.now < duration:
+        process = guard.process
+        
+        # 注入脚本化故障
+        while pending and pending[0][0] <= clock.now:
+            _, kind = pending.pop(0)
+            if fault_start is None:
+                fault_start = clock.now
+            if kind == "crash":
+                process.returncode = 1
+            else:
+                process.stalled = True
+                
+        # 健康进程按间隔写文件
+        if process and process.returncode is None and not process.stalled and clock.now >= next_write:
+            guard.latest_write = clock.now
+            next_write = clock.now + write_interval + rng.expovariate(1 / write_jitter) if write_jitter > 0 else clock.now + write_interval
+            
+        guard.monitor_tick()
+        
+        # 统计本轮发生的重启
+        if len(guard.launches) > launch_count:
+            launch_count = len(guard.launches)
+            if fault_start is not None:
+                latencies.append(guard.launches[-1][0] - fault_start)
+                fault_start = None
+            else:
+                false_restarts += 1
+            next_write = clock.now + write_interval
+            
+        clock.sleep(1)
+        
+    missed = (1 if fault_start is not None else 0) + len(pending)
+    return latencies, false_restarts, missed
+
+def simulate(first_delay, second_delay, runs=1000, duration=3600, write_interval=4, write_jitter=2, seed=0):
+    """批量运行随机场景，统计检测延迟与误重启率"""
+    rng = random.Random(seed)
+    config = {
+        "exec_path": "simulated",
+        "first_check_delay": first_delay,
+        "second_check_delay": second_delay,
+        "journal_file": ""
+    }
+    latencies = []
+    false_restarts = 0
+    missed = 0
+    started = time.perf_counter()
+    
+    for _ in range(runs):
+        # 每个场景在中段随机注入一次卡住或崩溃
+        faults = [(rng.uniform(duration * 0.25, duration * 0.75), rng.choice(("stall", "crash")))]
+        run_latencies, run_false, run_missed = run_scenario(config, duration, write_interval, write_jitter, faults, rng)
+        latencies.extend(run_latencies)
+        false_restarts += run_false
+        missed += run_missed
+        
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "runs": runs,
+        "detected": len(latencies),
+        "missed": missed,
+        "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+        "latency_p50": latencies[len(latencies) // 2] if latencies else None,
+        "latency_p95": latencies[int(len(latencies) * 0.95)] if latencies else None,
+        "latency_max": latencies[-1] if latencies else None,
+        "false_restarts": false_restarts,
+        "false_restarts_per_hour": false_restarts / (runs * duration / 3600),
+        "speedup": runs * duration / elapsed if elapsed > 0 else None
+    }
+
+def simulate_retention(cleanup_hours=20, hours=72, segment_interval=60, segment_jitter=10, seed=0):
+    """在虚拟时钟下运行自动清理，统计过期文件的删除时机
+    
+    录制程序按间隔写入分段文件（虚拟修改时间），清理线程每10秒执行一轮真实的清理逻辑。
+    """
+    rng = random.Random(seed)
+    clock = VirtualClock()
+    guard = SimulatedGuard({
+        "record_dir": "simulated",
+        "cleanup_hours": cleanup_hours,
+        "max_concurrent_scans": 0,
+        "journal_file": ""
+    }, clock, rng)
+    guard.cleanup_running = True
+    retention = cleanup_hours * 3600
+    duration = hours * 3600
+    started = time.perf_counter()
+    
+    next_segment = 0
+    next_cleanup = 0
+    written = 0
+    peak_files = 0
+    oldest_age = 0
+    while clock.now < duration:
+        if clock.now >= next_segment:
+            guard.files[os.path.join("simulated", f"segment-{written}.ts")] = clock.now
+            written += 1
+            next_segment = clock.now + segment_interval + rng.uniform(-segment_jitter, segment_jitter)
+        if clock.now >= next_cleanup:
+            # 分段按写入顺序保存，第一个即最旧的文件
+            if guard.files:
+                oldest_age = max(oldest_age, clock.now - next(iter(guard.files.values())))
+            peak_files = max(peak_files, len(guard.files))
+            guard.cleanup_tick()
+            next_cleanup = clock.now + 10
+        # 直接推进到下一个事件
+        clock.now = min(next_segment, next_cleanup)
+        
+    elapsed = time.perf_counter() - started
+    ages = [removed_at - mtime for removed_at, filepath, mtime in guard.removed]
+    lateness = [age - retention for age in ages]
+    return {
+        "written": written,
+        "removed": len(ages),
+        "premature_removals": sum(1 for age in ages if age < retention),
+        "lateness_mean": sum(lateness) / len(lateness) if lateness else None,
+        "lateness_max": max(lateness) if lateness else None,
+        "oldest_age_hours": oldest_age / 3600,
+        "peak_files": peak_files,
+        "speedup": duration / elapsed if elapsed > 0 else None
+    }
+
+def print_journal(args):
+    """命令行查询事件日志"""
+    if not os.path.exists(args.journal):
+        print(f"事件日志不存在: {args.journal}")
+        return
+    since = time.time() - args.hours * 3600 if args.hours else None
+    events, truncated = query_journal(args.journal, target=args.target, since=since, kind=args.kind, limit=args.limit)
+    if truncated:
+        print(f"警告: 事件超过{args.limit}条，仅显示最新的{args.limit}条（可用 --limit 调整）")
+    for event in events:
+        timestamp = datetime.fromtimestamp(event["ts"]).strftime('%Y-%m-%d %H:%M:%S')
+        exit_code = "" if event["exit_code"] is None else event["exit_code"]
+        pid = "" if event["pid"] is None else event["pid"]
+        print(f"{timestamp}  {event['target']}  {event['kind']:<12}  {pid!s:<8}  {exit_code!s:<5}  {event['detail'] or ''}")
+        
+    # 按原因统计整个时间范围内的启动次数
+    reasons = {}
+    if not args.kind or args.kind == "launch":
+        reasons = count_launches(args.journal, target=args.target, since=since)
+    if reasons:
+        print("启动次数: " + ", ".join(f"{reason}={count}" for reason, count in sorted(reasons.items())))
+        
 def main():
+    parser = argparse.ArgumentParser(description="程序监控系统")
+    parser.add_argument("--journal", metavar="DB", help="查询事件日志而不启动界面")
+    parser.add_argument("--target", help="按目标名称过滤")
+    parser.add_argument("--kind", help="按事件类型过滤（launch, exit, first_check, second_check, cleanup, error）")
+    parser.add_argument("--hours", type=float, default=24, help="查询最近多少小时（默认24，0表示全部）")
+    parser.add_argument("--limit", type=int, default=1000, help="最多返回条数")
+    parser.add_argument("--simulate", action="store_true", help="在虚拟时钟下运行检测延迟仿真")
+    parser.add_argument("--first-delay", type=int, default=10, help="仿真: 第一次检测延迟（秒）")
+    parser.add_argument("--second-delay", type=int, default=20, help="仿真: 第二次检测延迟（秒）")
+    parser.add_argument("--runs", type=int, default=1000, help="仿真: 场景数量")
+    parser.add_argument("--duration", type=int, default=3600, help="仿真: 每个场景时长（秒）")
+    parser.add_argument("--write-interval", type=float, default=4, help="仿真: 正常写文件间隔（秒）")
+    parser.add_argument("--write-jitter", type=float, default=2, help="仿真: 写文件间隔的平均额外抖动（秒）")
+    parser.add_argument("--seed", type=int, default=0, help="仿真: 随机种子")
+    parser.add_argument("--simulate-retention", action="store_true", help="在虚拟时钟下运行自动清理仿真")
+    parser.add_argument("--cleanup-hours", type=float, default=20, help="清理仿真: 文件保留时间（小时）")
+    parser.add_argument("--sim-hours", type=float, default=72, help="清理仿真: 仿真时长（小时）")
+    parser.add_argument("--segment-interval", type=float, default=60, help="清理仿真: 分段文件写入间隔（秒）")
+    args = parser.parse_args()
+    
+    if args.journal:
+        print_journal(args)
+        return
+        
+    if args.simulate:
+        result = simulate(args.first_delay, args.second_delay, args.runs, args.duration,
+                          args.write_interval, args.write_jitter, args.seed)
+        for key, value in result.items():
+            print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+        return
+        
+    if args.simulate_retention:
+        result = simulate_retention(args.cleanup_hours, args.sim_hours, args.segment_interval, seed=args.seed)
+        for key, value in result.items():
+            print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+        return
+        
     # 检查依赖
     try:
         import psutil
@@ -815,6 +2172,8 @@ def main():
     root = tk.Tk()
     app = OneKeyRecorderGUI(root)
     root.mainloop()
+    app.stop_control_server()
+    app.close_journal()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file